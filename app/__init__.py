@@ -6,6 +6,7 @@ from flask_mail import Mail
 from flask_caching import Cache
 from flask_login import LoginManager
 from dotenv import load_dotenv
+from sqlalchemy import event
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -69,6 +70,9 @@ def create_app(config_name=None):
     # Handle language selection
     @app.before_request
     def before_request():
+        # Static files are never translated, skip locale negotiation
+        if request.endpoint == 'static':
+            return
         g.locale = get_locale()
     
     # Create translation helper
@@ -99,6 +103,8 @@ def create_app(config_name=None):
     
     # Create database tables
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', set_sqlite_pragma)
         db.create_all()
 
     return app
@@ -106,11 +112,13 @@ def create_app(config_name=None):
 
 def configure_logging(app):
     """Configure logging for production"""
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
+    log_file = app.config.get('LOG_FILE', 'logs/agromap.log')
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
     
     file_handler = RotatingFileHandler(
-        app.config.get('LOG_FILE', 'logs/agromap.log'),
+        log_file,
         maxBytes=10240000,
         backupCount=10
     )
@@ -125,11 +133,26 @@ def configure_logging(app):
     app.logger.info('AgroMap application startup')
 
 
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """Use WAL so readers and writers in different workers don't block each other.
+    
+    WAL also avoids a rollback-journal fsync on every commit. With
+    synchronous=NORMAL the last commits before a power loss or OS crash may
+    be rolled back, but the database stays consistent.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def configure_security_headers(app):
     """Configure security headers for production"""
+    # Read once at startup instead of on every response
+    headers = app.config.get('SECURITY_HEADERS', {})
+    
     @app.after_request
     def set_security_headers(response):
-        headers = app.config.get('SECURITY_HEADERS', {})
         for header, value in headers.items():
             response.headers[header] = value
         return response
\ No newline at end of file
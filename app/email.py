@@ -1,5 +1,4 @@
 from flask import current_app, render_template
-from flask_mail import Message
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -26,7 +25,7 @@ def send_email(subject, sender, recipients, text_body, html_body):
         server.sendmail(sender, recipients, msg.as_string())
         server.quit()
     except Exception as e:
-        current_app.logger.error(f"Failed to send email: {e}")
+        current_app.logger.error("Failed to send email: %s", e)
 
 def send_password_reset_email(user):
     """Send password reset email with token"""
@@ -45,7 +45,7 @@ class User(UserMixin, db.Model):
 # Update existing models
 class CropReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    crop_type = db.Column(db.String(100), nullable=False)
+    crop_type = db.Column(db.String(100), index=True, nullable=False)
     field_size = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
@@ -1,10 +1,11 @@
 from flask import Blueprint, render_template, jsonify, request, make_response
 from datetime import datetime
-from app.models import CropReport, WeatherData, MapSuggestion
+from app.models import CropReport, MapSuggestion
 from app.services.weather_service import WeatherService
-from app import db
+from app import db, cache
 import requests
 import os
+import ipaddress
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,21 @@ bp = Blueprint('main', __name__)
 # Initialize weather service
 weather_service = WeatherService(os.environ.get('OPENWEATHER_API_KEY', None))
 
+# Weather responses are shared through the app cache (Redis in production),
+# so every worker process reuses one upstream lookup per location
+WEATHER_CACHE_TIMEOUT = 600
+
+# IP geolocation barely changes, keep successful lookups for a day
+IP_LOCATION_CACHE_TIMEOUT = 86400
+
+
+def _is_cacheable(rv):
+    """Only cache live upstream data, not error tuples or fallback estimates"""
+    if isinstance(rv, tuple):
+        return False
+    payload = rv.get_json(silent=True) or {}
+    return not payload.get('fallback')
+
 @bp.route('/')
 @bp.route('/index')
 def index():
@@ -84,6 +100,7 @@ def crop_reports():
         return jsonify({'result': 'success'})
 
 @bp.route('/api/weather')
+@cache.cached(timeout=WEATHER_CACHE_TIMEOUT, query_string=True, response_filter=_is_cacheable)
 def get_weather():
     """Get current weather data for specified location"""
     lat = request.args.get('lat', type=float)
@@ -99,6 +116,7 @@ def get_weather():
     return jsonify(weather_data)
 
 @bp.route('/api/weather/forecast')
+@cache.cached(timeout=WEATHER_CACHE_TIMEOUT, query_string=True, response_filter=_is_cacheable)
 def get_weather_forecast():
     """Get weather forecast for specified location"""
     lat = request.args.get('lat', type=float)
@@ -118,6 +136,7 @@ def get_weather_forecast():
     return jsonify(forecast_data)
 
 @bp.route('/api/weather/alerts')
+@cache.cached(timeout=WEATHER_CACHE_TIMEOUT, query_string=True, response_filter=_is_cacheable)
 def get_weather_alerts():
     """Get agricultural weather alerts for specified location"""
     lat = request.args.get('lat', type=float)
@@ -126,8 +145,13 @@ def get_weather_alerts():
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude required'}), 400
     
-    alerts = weather_service.get_agricultural_alerts(lat, lon)
-    return jsonify({'alerts': alerts})
+    weather_data = weather_service.get_weather(lat, lon)
+    alerts = weather_service.get_agricultural_alerts(lat, lon, weather_data)
+    
+    result = {'alerts': alerts}
+    if weather_data and weather_data.get('fallback'):
+        result['fallback'] = True
+    return jsonify(result)
 
 @bp.route('/api/crop-advisor')
 def crop_advisor():
@@ -226,6 +250,9 @@ def crop_trends():
 @bp.route('/api/price-prediction/<crop_type>')
 def price_prediction(crop_type):
     """Get price prediction for a specific crop"""
+    # One timestamp per response keeps every entry consistent
+    last_updated = datetime.now().isoformat()
+    
     # Mock price prediction data - in a real app this would use ML models
     mock_prices = {
         'wheat': {
@@ -233,21 +260,21 @@ def price_prediction(crop_type):
             'predicted_price': 2650,
             'confidence': 0.75,
             'trend': 'increasing',
-            'last_updated': datetime.now().isoformat()
+            'last_updated': last_updated
         },
         'cotton': {
             'current_price': 8500,
             'predicted_price': 8200,
             'confidence': 0.68,
             'trend': 'decreasing',
-            'last_updated': datetime.now().isoformat()
+            'last_updated': last_updated
         },
         'potato': {
             'current_price': 3200,
             'predicted_price': 3400,
             'confidence': 0.72,
             'trend': 'increasing',
-            'last_updated': datetime.now().isoformat()
+            'last_updated': last_updated
         }
     }
     
@@ -259,17 +286,24 @@ def price_prediction(crop_type):
             'predicted_price': 0,
             'confidence': 0,
             'trend': 'unknown',
-            'last_updated': datetime.now().isoformat(),
+            'last_updated': last_updated,
             'error': 'No data available for this crop'
         })
 
 @bp.route('/api/location-from-ip')
 def location_from_ip():
     """Get approximate location from IP address"""
-    client_ip = request.environ.get('HTTP_X_FORWARDED_FOR') or request.environ.get('REMOTE_ADDR')
+    forwarded = request.environ.get('HTTP_X_FORWARDED_FOR') or request.environ.get('REMOTE_ADDR') or ''
     
-    # For development, return Tashkent coordinates
-    if client_ip in ['127.0.0.1', 'localhost']:
+    # Only the first hop is the client. The header is client-controlled, so
+    # only a valid, normalized address may reach the cache key or the URL.
+    try:
+        client_ip = str(ipaddress.ip_address(forwarded.split(',')[0].strip()))
+    except ValueError:
+        client_ip = None
+    
+    # For development and unusable addresses, return Tashkent coordinates
+    if client_ip in [None, '127.0.0.1']:
         return jsonify({
             'latitude': 41.2995,
             'longitude': 69.2401,
@@ -277,21 +311,38 @@ def location_from_ip():
             'country': 'Uzbekistan'
         })
     
+    # The lookup must keep working when the cache backend is down
+    cache_key = f'ip-location:{client_ip}'
+    try:
+        location = cache.get(cache_key)
+    except Exception as e:
+        logger.warning("IP location cache unavailable: %s", e)
+        location = None
+    if location is not None:
+        return jsonify(location)
+    
     try:
         # Use a free IP geolocation service
         response = requests.get(f'http://ip-api.com/json/{client_ip}', timeout=5)
         if response.status_code == 200:
             data = response.json()
             if data['status'] == 'success':
-                return jsonify({
+                location = {
                     'latitude': data['lat'],
                     'longitude': data['lon'],
                     'city': data['city'],
                     'country': data['country']
-                })
+                }
     except:
         pass
     
+    if location is not None:
+        try:
+            cache.set(cache_key, location, timeout=IP_LOCATION_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("IP location cache unavailable: %s", e)
+        return jsonify(location)
+    
     # Fallback to Tashkent
     return jsonify({
         'latitude': 41.2995,
@@ -356,10 +407,11 @@ def market_intelligence(crop_type):
         
         if intelligence:
             # Add real-time market status
+            now = datetime.now()
             intelligence['real_time_status'] = {
-                'timestamp': datetime.now().isoformat(),
-                'market_hours': 'open' if 9 <= datetime.now().hour <= 17 else 'closed',
-                'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'timestamp': now.isoformat(),
+                'market_hours': 'open' if 9 <= now.hour <= 17 else 'closed',
+                'last_update': now.strftime('%Y-%m-%d %H:%M:%S')
             }
             
         return jsonify(intelligence or {'error': 'Intelligence not available'})
@@ -539,12 +591,12 @@ def analytics_dashboard():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         region = request.args.get('region')
-          dashboard_data = analytics.get_comprehensive_dashboard_data()
+        dashboard_data = analytics.get_comprehensive_dashboard_data()
         
         return jsonify(dashboard_data)
         
     except Exception as e:
-        logger.error(f"Error generating analytics dashboard: {e}")
+        logger.error("Error generating analytics dashboard: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/analytics/export')
@@ -574,7 +626,7 @@ def analytics_export():
             return jsonify({'data': export_data})
         
     except Exception as e:
-        logger.error(f"Error exporting analytics data: {e}")
+        logger.error("Error exporting analytics data: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/crop-rotation/plan')
@@ -631,7 +683,7 @@ def generate_rotation_plan():
         return jsonify(plan_data)
         
     except Exception as e:
-        logger.error(f"Error generating rotation plan: {e}")
+        logger.error("Error generating rotation plan: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/crop-rotation/export')
@@ -673,7 +725,7 @@ def export_rotation_plan():
             return jsonify({'data': export_data})
         
     except Exception as e:
-        logger.error(f"Error exporting rotation plan: {e}")
+        logger.error("Error exporting rotation plan: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/analytics/crop-diversity')
@@ -694,7 +746,7 @@ def get_crop_diversity_analysis():
         })
         
     except Exception as e:
-        logger.error(f"Error getting crop diversity analysis: {e}")
+        logger.error("Error getting crop diversity analysis: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/analytics/temporal-trends')
@@ -720,7 +772,7 @@ def get_temporal_trends():
         })
         
     except Exception as e:
-        logger.error(f"Error getting temporal trends: {e}")
+        logger.error("Error getting temporal trends: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/crop-rotation/available-crops')
@@ -751,5 +803,5 @@ def get_available_crops():
         })
         
     except Exception as e:
-        logger.error(f"Error getting available crops: {e}")
+        logger.error("Error getting available crops: %s", e)
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
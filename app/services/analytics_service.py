@@ -3,31 +3,73 @@ Advanced Analytics Service for AgroMap Uzbekistan
 Provides comprehensive data analysis, reporting, and insights
 """
 
+import os
 import sqlite3
 import json
-import pandas as pd
 from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+from collections import defaultdict
 import numpy as np
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# sqlite3 connections may not be shared across threads, so each thread
+# keeps its own connection per database file
+_thread_local = threading.local()
+
 class AnalyticsService:
     def __init__(self, db_path: str = 'instance/agromap_dev.db'):
-        self.db_path = db_path
+        self.db_path = os.path.abspath(db_path)
         
     def get_db_connection(self):
-        """Get database connection"""
+        """Get this thread's database connection, opening it on first use.
+        
+        The connection is reused across calls and reopened if the database
+        file is replaced. Callers must not close it; use close_db_connection.
+        """
+        connections = getattr(_thread_local, 'connections', None)
+        if connections is None:
+            connections = _thread_local.connections = {}
+        
+        # Never let sqlite3.connect create an empty database in its place
+        try:
+            stat = os.stat(self.db_path)
+        except OSError as e:
+            logger.error("Database connection error: %s", e)
+            self.close_db_connection()
+            return None
+        file_id = (stat.st_dev, stat.st_ino)
+        
+        cached = connections.get(self.db_path)
+        if cached is not None:
+            conn, cached_file_id = cached
+            if cached_file_id == file_id:
+                return conn
+            conn.close()
+            del connections[self.db_path]
+        
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
+            # Keep GROUP BY temp tables in memory and cache more pages
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -16000")
+            conn.execute("PRAGMA mmap_size = 268435456")
+            connections[self.db_path] = (conn, file_id)
             return conn
         except Exception as e:
-            logger.error(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             return None
     
+    def close_db_connection(self):
+        """Close this thread's connection to the database, if one is open"""
+        connections = getattr(_thread_local, 'connections', {})
+        cached = connections.pop(self.db_path, None)
+        if cached is not None:
+            cached[0].close()
+    
     def get_comprehensive_dashboard_data(self) -> Dict[str, Any]:
         """Get comprehensive analytics data for dashboard"""
         try:
@@ -56,8 +98,6 @@ class AnalyticsService:
             # Get sustainability metrics
             sustainability_metrics = self._get_sustainability_metrics(conn)
             
-            conn.close()
-            
             return {
                 'basic_stats': basic_stats,
                 'diversity_analysis': diversity_analysis,
@@ -70,16 +110,25 @@ class AnalyticsService:
             }
             
         except Exception as e:
-            logger.error(f"Error generating dashboard data: {e}")
+            logger.error("Error generating dashboard data: %s", e)
             return self._get_mock_dashboard_data()
     
     def _get_basic_statistics(self, conn) -> Dict[str, Any]:
         """Get basic agricultural statistics"""
         cursor = conn.cursor()
         
-        # Total reports and area
-        cursor.execute("SELECT COUNT(*) as total_reports, SUM(field_size) as total_area FROM crop_reports")
-        basic_data = cursor.fetchone()
+        # Total and recent (last 30 days) reports and area in a single scan
+        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        cursor.execute("""
+            SELECT 
+                COUNT(*) as total_reports,
+                ROUND(SUM(field_size), 2) as total_area,
+                COUNT(CASE WHEN timestamp >= :since THEN 1 END) as recent_reports,
+                ROUND(SUM(CASE WHEN timestamp >= :since THEN field_size END), 2) as recent_area,
+                ROUND(AVG(field_size), 2) as avg_field_size
+            FROM crop_reports
+        """, {'since': thirty_days_ago})
+        total_reports, total_area, recent_reports, recent_area, avg_field_size = cursor.fetchone()
         
         # Crop type distribution
         cursor.execute("""
@@ -90,30 +139,25 @@ class AnalyticsService:
         """)
         crop_distribution = cursor.fetchall()
         
-        # Recent activity (last 30 days)
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        cursor.execute("""
-            SELECT COUNT(*) as recent_reports, SUM(field_size) as recent_area
-            FROM crop_reports 
-            WHERE timestamp >= ?
-        """, (thirty_days_ago,))
-        recent_data = cursor.fetchone()
-        
         return {
-            'total_reports': basic_data['total_reports'] or 0,
-            'total_area': round(basic_data['total_area'] or 0, 2),
+            'total_reports': total_reports,
+            'total_area': total_area or 0,
             'crop_distribution': [dict(row) for row in crop_distribution],
-            'recent_reports': recent_data['recent_reports'] or 0,
-            'recent_area': round(recent_data['recent_area'] or 0, 2),
-            'avg_field_size': round((basic_data['total_area'] or 0) / max(basic_data['total_reports'] or 1, 1), 2)
+            'recent_reports': recent_reports,
+            'recent_area': recent_area or 0,
+            'avg_field_size': avg_field_size or 0
         }
     
     def _get_crop_diversity_analysis(self, conn) -> Dict[str, Any]:
         """Analyze crop diversity and distribution patterns"""
         cursor = conn.cursor()
         
-        # Crop diversity index (Shannon diversity)
-        cursor.execute("SELECT crop_type, COUNT(*) as count FROM crop_reports GROUP BY crop_type")
+        # Counts feed the Shannon diversity index, areas the concentration analysis
+        cursor.execute("""
+            SELECT crop_type, COUNT(*) as count, SUM(field_size) as total_area, AVG(field_size) as avg_size
+            FROM crop_reports 
+            GROUP BY crop_type
+        """)
         crop_counts = cursor.fetchall()
         
         total_reports = sum(row['count'] for row in crop_counts)
@@ -123,19 +167,15 @@ class AnalyticsService:
             proportions = [row['count'] / total_reports for row in crop_counts]
             diversity_index = -sum(p * np.log(p) for p in proportions if p > 0)
         
-        # Area concentration analysis
-        cursor.execute("""
-            SELECT crop_type, SUM(field_size) as total_area, AVG(field_size) as avg_size
-            FROM crop_reports 
-            GROUP BY crop_type
-        """)
-        area_analysis = cursor.fetchall()
-        
         return {
             'diversity_index': round(diversity_index, 3),
             'crop_count': len(crop_counts),
-            'area_distribution': [dict(row) for row in area_analysis],
-            'concentration_metrics': self._calculate_concentration_metrics(area_analysis)
+            'area_distribution': [{
+                'crop_type': row['crop_type'],
+                'total_area': row['total_area'],
+                'avg_size': row['avg_size']
+            } for row in crop_counts],
+            'concentration_metrics': self._calculate_concentration_metrics(crop_counts)
         }
     
     def _get_temporal_trends(self, conn) -> Dict[str, Any]:
@@ -314,7 +354,7 @@ class AnalyticsService:
                 raise ValueError(f"Unsupported format: {format_type}")
                 
         except Exception as e:
-            logger.error(f"Error exporting analytics data: {e}")
+            logger.error("Error exporting analytics data: %s", e)
             return f"Error: {str(e)}"
     
     def _convert_to_csv(self, data: Dict[str, Any]) -> str:
@@ -356,8 +396,8 @@ class AnalyticsService:
         gini = (2 * np.sum(index * areas)) / (n * np.sum(areas)) - (n + 1) / n
         
         # Herfindahl index
-        market_shares = [area / total_area for area in areas]
-        herfindahl = sum(share ** 2 for share in market_shares)
+        market_shares = np.asarray(areas, dtype=float) / total_area
+        herfindahl = float(np.sum(market_shares ** 2))
         
         return {
             'gini_coefficient': round(gini, 3),
@@ -391,15 +431,16 @@ class AnalyticsService:
         if not density_data:
             return {'avg_density': 0, 'max_density': 0, 'density_distribution': []}
         
-        densities = [row['local_density'] for row in density_data]
+        densities = np.fromiter((row['local_density'] for row in density_data),
+                                dtype=np.int64, count=len(density_data))
         
         return {
-            'avg_density': round(np.mean(densities), 2),
-            'max_density': max(densities),
+            'avg_density': round(float(densities.mean()), 2),
+            'max_density': int(densities.max()),
             'density_distribution': {
-                'low': sum(1 for d in densities if d <= 2),
-                'medium': sum(1 for d in densities if 2 < d <= 5),
-                'high': sum(1 for d in densities if d > 5)
+                'low': int(np.count_nonzero(densities <= 2)),
+                'medium': int(np.count_nonzero((densities > 2) & (densities <= 5))),
+                'high': int(np.count_nonzero(densities > 5))
             }
         }
     
@@ -5,9 +5,11 @@ Provides multi-season planning, rotation optimization, and agricultural best pra
 
 import sqlite3
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Deque
 import logging
+from collections import deque
+from itertools import islice
 from dataclasses import dataclass
 from enum import Enum
 
@@ -145,7 +147,7 @@ class CropRotationPlanner:
             conn.row_factory = sqlite3.Row
             return conn
         except Exception as e:
-            logger.error(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             return None
     
     def generate_rotation_plan(self, 
@@ -187,7 +189,7 @@ class CropRotationPlanner:
             )
             
         except Exception as e:
-            logger.error(f"Error generating rotation plan: {e}")
+            logger.error("Error generating rotation plan: %s", e)
             return self._get_default_rotation_plan(field_location, years)
     
     def _get_field_history(self, location: Tuple[float, float]) -> List[Dict[str, Any]]:
@@ -215,7 +217,7 @@ class CropRotationPlanner:
             return [dict(row) for row in history]
             
         except Exception as e:
-            logger.error(f"Error getting field history: {e}")
+            logger.error("Error getting field history: %s", e)
             return []
     
     def _analyze_field_conditions(self, 
@@ -284,10 +286,10 @@ class CropRotationPlanner:
         if avoid_crops:
             available_crops = [crop for crop in available_crops if crop not in avoid_crops]
         
-        # Get recent crops to avoid repetition
-        recent_crops = []
+        # Get recent crops to avoid repetition, keeping the last 6 seasons
+        recent_crops = deque(maxlen=6)
         if history:
-            recent_crops = [h['crop_type'] for h in history[:4]]  # Last 4 plantings
+            recent_crops.extend(h['crop_type'] for h in history[:4])  # Last 4 plantings
         
         current_season = self._get_current_season()
         nitrogen_level = conditions['soil_nitrogen']
@@ -316,8 +318,6 @@ class CropRotationPlanner:
                     
                     # Add to recent crops for rotation consideration
                     recent_crops.append(best_crop)
-                    if len(recent_crops) > 6:  # Keep last 6 seasons
-                        recent_crops.pop(0)
                     
                     season_plan = {
                         'year': year + 1,
@@ -358,12 +358,13 @@ class CropRotationPlanner:
                            season: SeasonType,
                            nitrogen_level: str,
                            conditions: Dict[str, Any],
-                           recent_crops: List[str]) -> Optional[str]:
+                           recent_crops: Deque[str]) -> Optional[str]:
         """Select optimal crop for given conditions"""
         scores = {}
+        last_two = set(islice(reversed(recent_crops), 2))
         
         for crop in available_crops:
-            if crop in recent_crops[-2:]:  # Avoid planting same crop in last 2 seasons
+            if crop in last_two:  # Avoid planting same crop in last 2 seasons
                 continue
                 
             crop_info = self.crop_compatibility[crop]
@@ -491,7 +492,7 @@ class CropRotationPlanner:
             'price_stability': 'stable' if crop_type in ['wheat', 'potato'] else 'volatile'
         }
     
-    def _identify_risk_factors(self, crop_type: str, conditions: Dict[str, Any], recent_crops: List[str]) -> List[str]:
+    def _identify_risk_factors(self, crop_type: str, conditions: Dict[str, Any], recent_crops: Deque[str]) -> List[str]:
         """Identify risk factors for crop choice"""
         risks = []
         
@@ -520,10 +521,13 @@ class CropRotationPlanner:
         if not seasons:
             return 0.0
         
+        # Crop diversity is a property of the whole plan, so compute it once
+        diverse_rotation = len(set(s['crop_type'] for s in seasons)) >= 3
+        
         total_score = 0
         for season in seasons:
             # Crop diversity bonus
-            if len(set(s['crop_type'] for s in seasons)) >= 3:
+            if diverse_rotation:
                 total_score += 20
             
             # Nitrogen fixing bonus
@@ -664,7 +668,7 @@ class CropRotationPlanner:
             else:
                 raise ValueError(f"Unsupported format: {format_type}")
         except Exception as e:
-            logger.error(f"Error exporting rotation plan: {e}")
+            logger.error("Error exporting rotation plan: %s", e)
             return f"Error: {str(e)}"
     
     def _convert_plan_to_csv(self, plan: RotationPlan) -> str:
@@ -1,7 +1,5 @@
 from datetime import datetime, timedelta
 from app.models import CropReport
-from app import db
-from sqlalchemy import func
 import math
 import random
 
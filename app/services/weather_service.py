@@ -1,7 +1,20 @@
 import requests
 from datetime import datetime, timedelta
 import statistics
-from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seasonal baselines for Uzbekistan, keyed by month:
+# (temperature at 40°N, adjustment per degree of latitude, humidity)
+_WINTER = (5, 2, 70)
+_SPRING = (18, 1.5, 55)
+_SUMMER = (32, 1, 35)
+_AUTUMN = (15, 1.5, 60)
+SEASONAL_BASELINES = {
+    1: _WINTER, 2: _WINTER, 3: _SPRING, 4: _SPRING, 5: _SPRING, 6: _SUMMER,
+    7: _SUMMER, 8: _SUMMER, 9: _AUTUMN, 10: _AUTUMN, 11: _AUTUMN, 12: _WINTER
+}
 
 class WeatherService:
     def __init__(self, api_key):
@@ -28,7 +41,7 @@ class WeatherService:
             data = response.json()
             return self._enhance_weather_data(data)
         except Exception as e:
-            print(f"Weather API error: {e}")
+            logger.error("Weather API error: %s", e)
             return self._get_fallback_weather(lat, lon) if self.fallback_enabled else None
 
     def get_forecast(self, lat, lon, days=7):
@@ -50,7 +63,7 @@ class WeatherService:
             data = response.json()
             return self._enhance_forecast_data(data)
         except Exception as e:
-            print(f"Forecast API error: {e}")
+            logger.error("Forecast API error: %s", e)
             return self._get_fallback_forecast(lat, lon, days) if self.fallback_enabled else None
 
     def _enhance_weather_data(self, data):
@@ -166,25 +179,15 @@ class WeatherService:
         
         return advice
 
+    def _seasonal_baseline(self, month, lat):
+        """Get baseline temperature and humidity for a month, adjusted by latitude"""
+        base_temp, lat_factor, humidity = SEASONAL_BASELINES[month]
+        return base_temp + (lat - 40) * lat_factor, humidity
+
     def _get_fallback_weather(self, lat, lon):
         """Provide realistic fallback weather data for Uzbekistan"""
         # Simulate realistic weather for Uzbekistan based on season
-        now = datetime.now()
-        month = now.month
-        
-        # Seasonal temperature ranges for Uzbekistan
-        if month in [12, 1, 2]:  # Winter
-            temp = 5 + (lat - 40) * 2  # Adjust by latitude
-            humidity = 70
-        elif month in [3, 4, 5]:  # Spring
-            temp = 18 + (lat - 40) * 1.5
-            humidity = 55
-        elif month in [6, 7, 8]:  # Summer
-            temp = 32 + (lat - 40) * 1
-            humidity = 35
-        else:  # Autumn
-            temp = 15 + (lat - 40) * 1.5
-            humidity = 60
+        temp, humidity = self._seasonal_baseline(datetime.now().month, lat)
         
         fallback_data = {
             "coord": {"lon": lon, "lat": lat},
@@ -212,21 +215,9 @@ class WeatherService:
         
         for i in range(days * 8):  # 8 entries per day (3-hour intervals)
             forecast_time = base_time + timedelta(hours=i * 3)
-            month = forecast_time.month
             
             # Seasonal adjustment
-            if month in [12, 1, 2]:
-                base_temp = 5 + (lat - 40) * 2
-                humidity = 70
-            elif month in [3, 4, 5]:
-                base_temp = 18 + (lat - 40) * 1.5
-                humidity = 55
-            elif month in [6, 7, 8]:
-                base_temp = 32 + (lat - 40) * 1
-                humidity = 35
-            else:
-                base_temp = 15 + (lat - 40) * 1.5
-                humidity = 60
+            base_temp, humidity = self._seasonal_baseline(forecast_time.month, lat)
             
             # Daily temperature variation
             hour = forecast_time.hour
@@ -260,9 +251,10 @@ class WeatherService:
         
         return self._enhance_forecast_data(fallback_forecast)
 
-    def get_agricultural_alerts(self, lat, lon):
+    def get_agricultural_alerts(self, lat, lon, weather=None):
         """Get weather-based agricultural alerts"""
-        weather = self.get_weather(lat, lon)
+        if weather is None:
+            weather = self.get_weather(lat, lon)
         if not weather:
             return []
         
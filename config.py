@@ -98,6 +98,9 @@ class ProductionConfig(Config):
     CACHE_TYPE = 'redis' if os.environ.get('REDIS_URL') else 'simple'
     CACHE_DEFAULT_TIMEOUT = 300
     
+    # Never stat template files on render, even if FLASK_DEBUG is set
+    TEMPLATES_AUTO_RELOAD = False
+    
     # Rate limiting
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL') or 'memory://'
 
@@ -7,16 +7,20 @@ import unittest
 import json
 import os
 import sys
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
 # Add the parent directory to the path to import app modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app, db
+from app import create_app, db, cache
 from app.models import User, CropReport, WeatherData, MapSuggestion
 from app.services.weather_service import WeatherService
 from app.services.market_analyzer import MarketAnalyzer
 from app.services.crop_advisor import CropAdvisor
+from app.services.analytics_service import AnalyticsService
 
 class WeatherServiceTestCase(unittest.TestCase):
     """Test cases for Weather Service"""
@@ -68,6 +72,16 @@ class WeatherServiceTestCase(unittest.TestCase):
         self.assertIn('total_rainfall', summary)
         self.assertIn('growing_degree_days', summary)
     
+    def test_seasonal_baseline(self):
+        """Test seasonal baselines cover every month and adjust by latitude"""
+        for month in range(1, 13):
+            temp, humidity = self.weather_service._seasonal_baseline(month, 40)
+            self.assertIsInstance(temp, (int, float))
+            self.assertIn(humidity, [35, 55, 60, 70])
+        
+        self.assertEqual(self.weather_service._seasonal_baseline(1, 41), (7, 70))
+        self.assertEqual(self.weather_service._seasonal_baseline(7, 42), (34, 35))
+    
     def test_agricultural_alerts(self):
         """Test agricultural alerts generation"""
         alerts = self.weather_service.get_agricultural_alerts(self.test_lat, self.test_lon)
@@ -187,6 +201,95 @@ class FlaskAppTestCase(unittest.TestCase):
         self.assertIn('alerts', data)
         self.assertIsInstance(data['alerts'], list)
     
+    @patch('app.services.weather_service.requests.get')
+    def test_weather_fallback_not_cached(self, mock_get):
+        """Test that fallback weather is replaced once the API recovers"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            'main': {'temp': 45.0, 'humidity': 50},
+            'wind': {'speed': 3.0}
+        }
+        mock_get.side_effect = [Exception('API down'), mock_response,
+                                Exception('API down'), mock_response]
+        
+        with patch('app.routes.weather_service.api_key', 'test-key'):
+            url = '/api/weather?lat=40.1&lon=65.1'
+            self.assertTrue(json.loads(self.client.get(url).data)['fallback'])
+            data = json.loads(self.client.get(url).data)
+            self.assertNotIn('fallback', data)
+            self.assertEqual(data['main']['temp'], 45.0)
+        
+            url = '/api/weather/alerts?lat=40.2&lon=65.2'
+            self.assertTrue(json.loads(self.client.get(url).data)['fallback'])
+            data = json.loads(self.client.get(url).data)
+            self.assertNotIn('fallback', data)
+            self.assertEqual(data['alerts'][0]['type'], 'extreme_heat')
+        
+            # Live responses are cached
+            self.client.get(url)
+            self.assertEqual(mock_get.call_count, 4)
+    
+    def _ip_location_response(self):
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            'status': 'success', 'lat': 39.6542, 'lon': 66.9597,
+            'city': 'Samarkand', 'country': 'Uzbekistan'
+        }
+        return mock_response
+    
+    @patch('app.routes.requests.get')
+    def test_location_from_ip_cached(self, mock_get):
+        """Test that a successful IP lookup is served from the cache"""
+        mock_get.side_effect = [self._ip_location_response(), Exception('API down')]
+        headers = {'X-Forwarded-For': '203.0.113.7'}
+        
+        self.assertEqual(json.loads(self.client.get('/api/location-from-ip', headers=headers).data)['city'], 'Samarkand')
+        self.assertEqual(json.loads(self.client.get('/api/location-from-ip', headers=headers).data)['city'], 'Samarkand')
+        self.assertEqual(mock_get.call_count, 1)
+    
+    @patch('app.routes.requests.get')
+    def test_location_from_ip_failure_not_cached(self, mock_get):
+        """Test that a failed IP lookup falls back without being cached"""
+        mock_get.side_effect = [Exception('API down'), self._ip_location_response()]
+        headers = {'X-Forwarded-For': '203.0.113.8'}
+        
+        self.assertEqual(json.loads(self.client.get('/api/location-from-ip', headers=headers).data)['city'], 'Tashkent')
+        self.assertEqual(json.loads(self.client.get('/api/location-from-ip', headers=headers).data)['city'], 'Samarkand')
+    
+    @patch('app.routes.requests.get')
+    def test_location_from_ip_proxy_chain(self, mock_get):
+        """Test that only the first hop of X-Forwarded-For is looked up and cached"""
+        mock_get.return_value = self._ip_location_response()
+        
+        self.client.get('/api/location-from-ip', headers={'X-Forwarded-For': '203.0.113.10, 10.0.0.1'})
+        response = self.client.get('/api/location-from-ip', headers={'X-Forwarded-For': '203.0.113.10'})
+        
+        self.assertEqual(json.loads(response.data)['city'], 'Samarkand')
+        mock_get.assert_called_once_with('http://ip-api.com/json/203.0.113.10', timeout=5)
+    
+    @patch('app.routes.requests.get')
+    def test_location_from_ip_invalid_address(self, mock_get):
+        """Test that an invalid forwarded address skips the lookup and the cache"""
+        with patch.object(cache, 'get') as mock_cache_get:
+            response = self.client.get('/api/location-from-ip', headers={'X-Forwarded-For': 'evil/../key'})
+        
+        self.assertEqual(json.loads(response.data)['city'], 'Tashkent')
+        mock_get.assert_not_called()
+        mock_cache_get.assert_not_called()
+    
+    @patch('app.routes.requests.get')
+    def test_location_from_ip_cache_unavailable(self, mock_get):
+        """Test that IP lookups still work when the cache backend is down"""
+        mock_get.return_value = self._ip_location_response()
+        headers = {'X-Forwarded-For': '203.0.113.9'}
+        
+        with patch.object(cache, 'get', side_effect=ConnectionError), \
+             patch.object(cache, 'set', side_effect=ConnectionError):
+            response = self.client.get('/api/location-from-ip', headers=headers)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['city'], 'Samarkand')
+    
     def test_crop_reports_api(self):
         """Test crop reports API endpoint"""
         # Test GET request
@@ -342,6 +445,104 @@ class CropAdvisorTestCase(unittest.TestCase):
             self.assertIn('suitability_score', crop)
             self.assertIn('reasons', crop)
 
+class AnalyticsServiceTestCase(unittest.TestCase):
+    """Test cases for Analytics Service"""
+    
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.service = AnalyticsService(self.db_path)
+    
+    def tearDown(self):
+        self.service.close_db_connection()
+        os.remove(self.db_path)
+    
+    def _create_reports(self, reports, db_path=None):
+        """Create a crop_reports table with (crop_type, field_size, days_ago) rows"""
+        conn = sqlite3.connect(db_path or self.db_path)
+        conn.execute("""
+            CREATE TABLE crop_reports (
+                crop_type TEXT, field_size REAL, latitude REAL, longitude REAL, timestamp TEXT
+            )
+        """)
+        for crop_type, field_size, days_ago in reports:
+            timestamp = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute("INSERT INTO crop_reports VALUES (?, ?, ?, ?, ?)",
+                         (crop_type, field_size, 41.3, 69.2, timestamp))
+        conn.commit()
+        conn.close()
+    
+    def test_connection_reuse(self):
+        """Test that the connection is reused until the database file is replaced"""
+        self._create_reports([('wheat', 10.0, 1)])
+        conn = self.service.get_db_connection()
+        self.assertIs(self.service.get_db_connection(), conn)
+        self.assertEqual(self.service.get_comprehensive_dashboard_data()['basic_stats']['total_reports'], 1)
+        self.assertIs(self.service.get_db_connection(), conn)
+        
+        # Replace the file, as restoring a backup would
+        fd, new_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self._create_reports([('wheat', 10.0, 1), ('cotton', 5.0, 1)], new_path)
+        os.replace(new_path, self.db_path)
+        
+        self.assertIsNot(self.service.get_db_connection(), conn)
+        self.assertEqual(self.service.get_comprehensive_dashboard_data()['basic_stats']['total_reports'], 2)
+    
+    def test_missing_database(self):
+        """Test that a missing database file is not created"""
+        service = AnalyticsService(self.db_path + '.missing')
+        
+        self.assertIsNone(service.get_db_connection())
+        self.assertFalse(os.path.exists(self.db_path + '.missing'))
+    
+    def test_dashboard_statistics(self):
+        """Test basic statistics and crop diversity against known values"""
+        self._create_reports([
+            ('wheat', 10.0, 1),
+            ('wheat', 5.0, 90),
+            ('cotton', 20.0, 2),
+            ('potato', 5.0, 120)
+        ])
+        data = self.service.get_comprehensive_dashboard_data()
+        
+        basic = data['basic_stats']
+        self.assertEqual(basic['total_reports'], 4)
+        self.assertEqual(basic['total_area'], 40.0)
+        self.assertEqual(basic['recent_reports'], 2)
+        self.assertEqual(basic['recent_area'], 30.0)
+        self.assertEqual(basic['avg_field_size'], 10.0)
+        
+        diversity = data['diversity_analysis']
+        self.assertEqual(diversity['crop_count'], 3)
+        self.assertEqual(diversity['diversity_index'], 1.04)
+        areas = {row['crop_type']: row for row in diversity['area_distribution']}
+        self.assertEqual(areas['wheat'], {'crop_type': 'wheat', 'total_area': 15.0, 'avg_size': 7.5})
+        self.assertEqual(areas['cotton']['total_area'], 20.0)
+        self.assertEqual(areas['potato']['avg_size'], 5.0)
+        self.assertEqual(diversity['concentration_metrics'],
+                         {'gini_coefficient': 0.25, 'herfindahl_index': 0.406})
+    
+    def test_empty_dashboard_statistics(self):
+        """Test basic statistics on an empty table"""
+        self._create_reports([])
+        basic = self.service.get_comprehensive_dashboard_data()['basic_stats']
+        
+        self.assertEqual(basic['total_reports'], 0)
+        self.assertEqual(basic['total_area'], 0)
+        self.assertEqual(basic['recent_reports'], 0)
+        self.assertEqual(basic['avg_field_size'], 0)
+    
+    def test_statistics_rounding(self):
+        """Test that totals use SQLite rounding, halfway values away from zero"""
+        self._create_reports([('wheat', 2.675, 1)])
+        basic = self.service.get_comprehensive_dashboard_data()['basic_stats']
+        
+        # Python's round(2.675, 2) gives 2.67
+        self.assertEqual(basic['total_area'], 2.68)
+        self.assertEqual(basic['recent_area'], 2.68)
+        self.assertEqual(basic['avg_field_size'], 2.68)
+
 if __name__ == '__main__':
     # Create test suite
     test_suite = unittest.TestSuite()
@@ -352,6 +553,7 @@ if __name__ == '__main__':
     test_suite.addTest(unittest.makeSuite(FlaskAppTestCase))
     test_suite.addTest(unittest.makeSuite(DatabaseModelTestCase))
     test_suite.addTest(unittest.makeSuite(CropAdvisorTestCase))
+    test_suite.addTest(unittest.makeSuite(AnalyticsServiceTestCase))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)